@@ -2,63 +2,84 @@
 """
 List available PyAudio devices in JSON format.
 """
-import json
 import sys
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    import json
+
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+
+def _write_stdout(payload: bytes):
+    out = sys.stdout.buffer
+    out.write(payload)
+    out.flush()
+
+
+def _emit(obj):
+    _write_stdout(_dumps(obj) + b"\n")
+
+
 try:
     if sys.platform == 'win32':
         import pyaudiowpatch as pyaudio
     else:
         import pyaudio
 except Exception as e:
-    print(json.dumps({'error': str(e)}))
+    _emit({'error': str(e)})
     sys.exit(1)
 
+
+def _device_entry(index, info, is_loopback: bool) -> dict:
+    return {
+        'index': index,
+        'name': info.get('name'),
+        'maxInputChannels': info.get('maxInputChannels', 0),
+        'maxOutputChannels': info.get('maxOutputChannels', 0),
+        'isLoopback': is_loopback,
+    }
+
+
+def enumerate_devices(p, include_loopback: bool = True):
+    loopback_by_index = {}
+    if include_loopback and sys.platform == 'win32' and hasattr(p, 'get_loopback_device_info_generator'):
+        try:
+            for info in p.get_loopback_device_info_generator():
+                idx = info.get('index')
+                loopback_by_index[idx] = _device_entry(idx, info, True)
+        except Exception:
+            loopback_by_index = {}
+    match_blackhole = sys.platform == 'darwin'
+    for i in range(p.get_device_count()):
+        if i in loopback_by_index:
+            continue
+        try:
+            info = p.get_device_info_by_index(i)
+        except Exception:
+            continue
+        name = info.get('name')
+        name_folded = name.casefold() if isinstance(name, str) else ''
+        is_loopback = 'loopback' in name_folded or (match_blackhole and 'blackhole' in name_folded)
+        yield _device_entry(i, info, is_loopback)
+    yield from loopback_by_index.values()
+
+
 def main():
     p = pyaudio.PyAudio()
-    devices = []
-    loopback_by_index = {}
     try:
-        if sys.platform == 'win32' and hasattr(p, 'get_loopback_device_info_generator'):
-            try:
-                for info in p.get_loopback_device_info_generator():
-                    idx = info.get('index')
-                    loopback_by_index[idx] = {
-                        'index': idx,
-                        'name': info.get('name'),
-                        'maxInputChannels': info.get('maxInputChannels', 0),
-                        'maxOutputChannels': info.get('maxOutputChannels', 0),
-                        'isLoopback': True,
-                    }
-            except Exception:
-                loopback_by_index = {}
-        for i in range(p.get_device_count()):
-            try:
-                info = p.get_device_info_by_index(i)
-            except Exception:
-                continue
-            name = info.get('name')
-            name_lower = name.lower() if isinstance(name, str) else ''
-            is_loopback = 'loopback' in name_lower
-            if sys.platform == 'darwin' and 'blackhole' in name_lower:
-                is_loopback = True
-            if i in loopback_by_index:
-                continue
-            devices.append({
-                'index': i,
-                'name': name,
-                'maxInputChannels': info.get('maxInputChannels', 0),
-                'maxOutputChannels': info.get('maxOutputChannels', 0),
-                'isLoopback': is_loopback,
-            })
-        if loopback_by_index:
-            devices.extend(loopback_by_index.values())
+        devices = list(enumerate_devices(p, include_loopback=True))
     finally:
         try:
             p.terminate()
         except Exception:
             pass
 
-    print(json.dumps({'devices': devices}))
+    _emit({'devices': devices})
 
 if __name__ == '__main__':
     main()
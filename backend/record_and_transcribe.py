@@ -16,32 +16,65 @@ Emits JSON on stdout:
 """
 
 import collections
+import functools
+import glob
 import json
 import os
 import queue
 import signal
+import struct
 import sys
 import threading
 import time
-import wave
 
 import numpy as np
+# Read by PortAudio's host APIs at init; must be set before pyaudio is imported. Callers can override it.
+os.environ.setdefault("PA_MIN_LATENCY_MSEC", "10")
 if sys.platform == "win32":
     import pyaudiowpatch as pyaudio
 else:
     import pyaudio
 import torch
 import whisper
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
 
 
 TARGET_RATE = 16000
 TARGET_CHANNELS = 1
 TARGET_CHUNK = 512
 VAD_THRESHOLD = 0.5
+VAD_NOISE_GATE_RMS = 60  # int16 RMS (~-55 dBFS); quieter blocks skip the neural VAD
 VAD_MIN_SILENCE_MS = 600
 VAD_MIN_SPEECH_MS = 200
 VAD_PRE_PAD_MS = 200
 VAD_POST_PAD_MS = 200
+TAIL_TRIM_WINDOW_MS = 20
+TAIL_TRIM_RMS = 100
+WAV_WRITE_BATCH_BYTES = 64 * 1024
+CAPTURE_BACKLOG_SEC = 8
+# Loopback is mixed one block per mic block, so any deeper backlog would only become a growing offset
+# between mic and system audio; keep just the newest blocks and let older ones fall off.
+LOOPBACK_BACKLOG_BLOCKS = 2
+TRANSCRIBE_BATCH_MAX = 8
+UTTERANCE_INITIAL_SEC = 30
+UTTERANCE_QUEUE_MAX = 8
+UTTERANCE_MERGE_MAX_SEC = 30  # one Whisper window; backlogged utterances are merged up to this length
+
+_stdout_lock = threading.Lock()
+
+_I16_TO_F32 = np.float32(1.0 / 32768.0)
+_EMPTY_I16 = np.empty(0, dtype=np.int16)
+_EMPTY_I16.flags.writeable = False
+
+_pack_wav_header = struct.Struct("<4sI4s4sIHHIIHH4sI").pack
+_pack_u32 = struct.Struct("<I").pack
 
 
 class SessionState:
@@ -50,6 +83,10 @@ class SessionState:
         self.transcript_path = transcript_path
         self.stream = stream
         self.loopback_stream = None
+        self.mic_capture = None
+        self.loopback_capture = None
+        self.mic_key = None
+        self.loopback_key = None
         self.mic_channels = TARGET_CHANNELS
         self.loopback_channels = TARGET_CHANNELS
         self.mic_rate = TARGET_RATE
@@ -59,18 +96,239 @@ class SessionState:
         self.wf = wf
         self.pre_buffer = collections.deque()
         self.silence_buffer = []
-        self.utterance_frames = []
+        self.utterance = UtteranceBuffer(TARGET_RATE * UTTERANCE_INITIAL_SEC)
         self.speech_run = 0
         self.speaking = False
         self.start_t = time.time()
-        self.last_print = 0.0
-        self.paused = False
+        self.last_print_sec = 0
+        self.dropped_reported = 0
+        self.pause_event = threading.Event()
         self.stop_event = threading.Event()
         self.done_event = threading.Event()
         self.transcript_parts = []
         self.transcript_lock = threading.Lock()
-        self.utterance_queue = queue.Queue()
+        self.utterance_queue = queue.Queue(maxsize=UTTERANCE_QUEUE_MAX)
+        self.backlog_warned = False
+        self.held_utterance = None
+        self.dropped_utterances = 0
         self.worker = None
+        self.mix_scratch = np.empty(TARGET_CHUNK, dtype=np.float32)
+        self.vad_f32 = np.empty(TARGET_CHUNK, dtype=np.float32)
+        self.vad_tensor = torch.from_numpy(self.vad_f32)
+        self.vad_carry = np.empty(TARGET_CHUNK * 4, dtype=np.int16)
+        self.vad_carry_fill = 0
+
+    def scratch_f32(self, size: int) -> np.ndarray:
+        if self.mix_scratch.size < size:
+            self.mix_scratch = np.empty(size, dtype=np.float32)
+        return self.mix_scratch[:size]
+
+    def vad_input(self, audio_i16: np.ndarray) -> torch.Tensor:
+        """Scale a mixed block to [-1, 1) float32 in the session's reusable VAD buffer.
+
+        Returns a tensor aliasing that buffer, so the per-block path creates no new tensors.
+        """
+        n = audio_i16.size
+        if self.vad_f32.size != n:
+            self.vad_f32 = np.empty(n, dtype=np.float32)
+            self.vad_tensor = torch.from_numpy(self.vad_f32)
+        np.multiply(audio_i16, _I16_TO_F32, out=self.vad_f32, dtype=np.float32)
+        return self.vad_tensor
+
+    def vad_windows(self, audio_i16: np.ndarray):
+        """Re-cut mixed blocks into exactly TARGET_CHUNK-sample windows for the VAD and segmenter.
+
+        Resampled device blocks are only approximately TARGET_CHUNK long; Silero is fed a fixed
+        window shape instead, and any remainder is carried into the next block.
+        """
+        window = TARGET_CHUNK
+        fill = self.vad_carry_fill
+        n = audio_i16.size
+        if fill == 0 and n == window:
+            return (audio_i16,)
+        if fill + n > self.vad_carry.size:
+            grown = np.empty(fill + n + window, dtype=np.int16)
+            grown[:fill] = self.vad_carry[:fill]
+            self.vad_carry = grown
+        carry = self.vad_carry
+        carry[fill:fill + n] = audio_i16
+        fill += n
+        count = fill // window
+        used = count * window
+        # Copied out because the pre-roll and silence buffers keep references to the windows.
+        windows = carry[:used].reshape(count, window).copy()
+        carry[: fill - used] = carry[used:fill]
+        self.vad_carry_fill = fill - used
+        return windows
+
+
+class CaptureBuffer:
+    """Blocks pushed by a PortAudio stream callback and popped by the recording loop.
+
+    The backlog is bounded: if the loop falls behind, the oldest blocks are dropped
+    (and counted) so the callback never blocks or grows memory without limit.
+    """
+
+    def __init__(self, max_blocks: int = None):
+        self.blocks = collections.deque(maxlen=max_blocks)
+        self.ready = threading.Event()
+        self.dropped = 0
+
+    def callback(self, in_data, frame_count, time_info, status):
+        blocks = self.blocks
+        if len(blocks) == blocks.maxlen:
+            self.dropped += 1
+        blocks.append(in_data)
+        self.ready.set()
+        return (None, pyaudio.paContinue)
+
+    def pop(self, timeout: float = 0.0):
+        if not self.blocks and timeout > 0:
+            self.ready.clear()
+            if not self.blocks:
+                self.ready.wait(timeout)
+        try:
+            return self.blocks.popleft()
+        except IndexError:
+            return None
+
+    def clear(self):
+        self.blocks.clear()
+
+
+class UtteranceBuffer:
+    """Growable int16 buffer the segmenter appends speech blocks into.
+
+    take() hands the filled array to the caller and starts a fresh one, so a
+    finished utterance is never re-copied (no concatenate of per-block arrays).
+    """
+
+    def __init__(self, capacity: int):
+        self.initial_capacity = max(1, capacity)
+        self.data = np.empty(self.initial_capacity, dtype=np.int16)
+        self.size = 0
+
+    def append(self, block: np.ndarray):
+        end = self.size + block.size
+        if end > self.data.size:
+            grown = np.empty(max(end, self.data.size * 2), dtype=np.int16)
+            grown[: self.size] = self.data[: self.size]
+            self.data = grown
+        self.data[self.size:end] = block
+        self.size = end
+
+    def extend(self, blocks):
+        for block in blocks:
+            self.append(block)
+
+    def take(self) -> np.ndarray:
+        audio_i16 = self.data[: self.size]
+        self.data = np.empty(self.initial_capacity, dtype=np.int16)
+        self.size = 0
+        return audio_i16
+
+    def clear(self):
+        self.size = 0
+
+
+class PcmWavWriter:
+    """Append-only PCM WAV file; the RIFF/data sizes are patched once on close.
+
+    Writes are batched into ~64 KiB runs and handed to a background thread so a slow disk
+    never stalls capture.
+    """
+
+    def __init__(self, path: str, channels: int, rate: int, sample_width: int):
+        # Unbuffered: batches are already coalesced below, so skip BufferedWriter's extra copy.
+        self.f = open(path, "wb", buffering=0)
+        self.data_bytes = 0
+        self.sample_width = sample_width
+        block_align = channels * sample_width
+        self._pending = bytearray()
+        self._flush_bytes = max(block_align, WAV_WRITE_BATCH_BYTES - WAV_WRITE_BATCH_BYTES % block_align)
+        self._write_all(
+            _pack_wav_header(
+                b"RIFF", 36, b"WAVE",
+                b"fmt ", 16, 1, channels, rate, rate * block_align, block_align, sample_width * 8,
+                b"data", 0,
+            )
+        )
+        self._queue = queue.SimpleQueue()
+        self._closing = False
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _write_all(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[self.f.write(view):]
+
+    def _drain(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            try:
+                self._write_all(data)
+            except Exception as e:
+                print(f"[record] audio write failed: {e}", file=sys.stderr, flush=True)
+        try:
+            self.f.seek(4)
+            self._write_all(_pack_u32(36 + self.data_bytes))
+            self.f.seek(40)
+            self._write_all(_pack_u32(self.data_bytes))
+        except Exception as e:
+            print(f"[record] failed to finalize wav header: {e}", file=sys.stderr, flush=True)
+        finally:
+            self.f.close()
+
+    def write(self, data):
+        # Accepts any C-contiguous buffer (bytes or an int16 ndarray); the memoryview keeps
+        # numpy from hijacking += and lets the sizes be counted in bytes.
+        before = len(self._pending)
+        self._pending += memoryview(data)
+        pending = len(self._pending)
+        self.data_bytes += pending - before
+        if pending >= self._flush_bytes:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            # Hand the filled buffer itself to the writer thread instead of copying it.
+            self._queue.put(self._pending)
+            self._pending = bytearray()
+
+    def close(self, wait: bool = True):
+        """Finish the file on the writer thread; with wait=False, return without waiting for it."""
+        if not self._closing:
+            self._closing = True
+            self.flush()
+            self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+
+def _write_stdout(payload: bytes):
+    # One os.write per line (retried on short writes) instead of print's text/buffer layers;
+    # the lock keeps lines from different threads whole, and the text layer is flushed first
+    # so earlier print() output stays in order.
+    with _stdout_lock:
+        sys.stdout.flush()
+        fd = sys.stdout.fileno()
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+
+
+def _close_streams(*streams):
+    for stream in streams:
+        if stream is None:
+            continue
+        try:
+            stream.stop_stream()
+            stream.close()
+        except Exception:
+            pass
 
 
 def _write_transcript(path: str, text: str):
@@ -79,12 +337,77 @@ def _write_transcript(path: str, text: str):
         f.write(text)
 
 
+# Layouts of the snakers4/silero-vad hub checkout: (model file dir, utils_vad.py dir), newest first.
+_SILERO_LAYOUTS = (
+    (("src", "silero_vad", "data"), ("src", "silero_vad")),
+    (("files",), ()),
+)
+
+
+def _cached_silero_files(model_file: str):
+    """Yield (model path, utils_vad.py path) for each silero-vad checkout in the torch hub cache."""
+    repos = sorted(glob.glob(os.path.join(torch.hub.get_dir(), "snakers4_silero-vad_*")), reverse=True)
+    for model_dir, utils_dir in _SILERO_LAYOUTS:
+        for repo in repos:
+            model_path = os.path.join(repo, *model_dir, model_file)
+            if os.path.isfile(model_path):
+                yield model_path, os.path.join(repo, *utils_dir, "utils_vad.py")
+
+
+def _load_cached_vad_onnx():
+    # Same construction as hubconf's silero_vad(onnx=True): the repo's OnnxWrapper around the cached
+    # .onnx file, minus torch.hub's repo validation and hubconf import.
+    import importlib.util
+
+    for onnx_path, utils_path in _cached_silero_files("silero_vad.onnx"):
+        if not os.path.isfile(utils_path):
+            continue
+        spec = importlib.util.spec_from_file_location("_silero_utils_vad", utils_path)
+        utils_vad = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(utils_vad)
+        return utils_vad.OnnxWrapper(onnx_path, force_onnx_cpu=True)
+    return None
+
+
 def _vad_load():
     try:
         import torchaudio  # noqa: F401
     except Exception as e:
         print(f"[vad] missing torchaudio: {e}", file=sys.stderr, flush=True)
         return None
+    # The ONNX export runs the per-chunk forward in onnxruntime (single-threaded session) instead of
+    # TorchScript; it exposes the same __call__/reset_states, so _vad_prob needs no changes.
+    try:
+        import onnxruntime  # noqa: F401
+        use_onnx = True
+    except Exception:
+        use_onnx = False
+    if use_onnx:
+        # setup.py already cached the checkout; load it directly and keep torch.hub for a cold cache.
+        try:
+            model = _load_cached_vad_onnx()
+            if model is not None:
+                return model
+        except Exception as e:
+            print(f"[vad] failed to load cached silero-vad onnx: {e}", file=sys.stderr, flush=True)
+        try:
+            model, _utils = torch.hub.load(
+                repo_or_dir="snakers4/silero-vad",
+                model="silero_vad",
+                trust_repo=True,
+                force_reload=False,
+                onnx=True,
+            )
+            return model
+        except Exception as e:
+            print(f"[vad] failed to load silero-vad onnx: {e}", file=sys.stderr, flush=True)
+    # TorchScript: load the checkpoint setup.py already cached directly, skipping hubconf and its imports.
+    jit_path = next((path for path, _utils_path in _cached_silero_files("silero_vad.jit")), None)
+    if jit_path:
+        try:
+            return torch.jit.load(jit_path, map_location="cpu").eval()
+        except Exception as e:
+            print(f"[vad] failed to load cached {jit_path}: {e}", file=sys.stderr, flush=True)
     try:
         model, _utils = torch.hub.load(
             repo_or_dir="snakers4/silero-vad",
@@ -98,55 +421,162 @@ def _vad_load():
         return None
 
 
-def _vad_prob(vad_model, audio_float: np.ndarray, sample_rate: int) -> float:
+def _vad_prob(vad_model, audio_float, sample_rate: int) -> float:
     if vad_model is None:
         return 0.0
-    with torch.no_grad():
-        tensor = torch.from_numpy(audio_float)
+    with torch.inference_mode():
+        tensor = audio_float if isinstance(audio_float, torch.Tensor) else torch.from_numpy(audio_float)
         prob = vad_model(tensor, sample_rate)
         if isinstance(prob, torch.Tensor):
             return float(prob.item())
         return float(prob)
 
 
-def _downmix_to_mono(audio_i16: np.ndarray, channels: int) -> np.ndarray:
+def _trim_silent_tail(audio_i16: np.ndarray, max_trim: int, window: int, rms_threshold: float) -> np.ndarray:
+    """Drop trailing near-silent windows (at most max_trim samples) so Whisper decodes less padding."""
+    if window <= 0 or max_trim < window or audio_i16.size <= max_trim:
+        return audio_i16
+    n_windows = max_trim // window
+    tail = audio_i16[audio_i16.size - n_windows * window:].astype(np.float32).reshape(n_windows, window)
+    energy = np.einsum("ij,ij->i", tail, tail)
+    loud = np.flatnonzero(energy >= rms_threshold * rms_threshold * window)
+    keep_windows = int(loud[-1]) + 1 if loud.size else 0
+    return audio_i16[: audio_i16.size - (n_windows - keep_windows) * window]
+
+
+def _load_transcriber(model_name: str, device: str, download_root: str = None):
+    """Return transcribe(list of audio_f32) -> list of str for the configured Whisper backend.
+
+    openai-whisper is the default (the installer ships its .pt checkpoints). Setting
+    WHISPER_BACKEND=faster opts into faster-whisper's CTranslate2 runtime (int8 on CPU,
+    float16 on CUDA); if it is missing or fails to load, openai-whisper is used instead.
+    """
+    backend = os.environ.get("WHISPER_BACKEND", "").strip().lower()
+    if backend in ("faster", "faster-whisper", "ctranslate2"):
+        try:
+            from faster_whisper import WhisperModel
+
+            compute_type = "float16" if device == "cuda" else "int8"
+            fw_model = WhisperModel(model_name, device=device, compute_type=compute_type, download_root=download_root)
+
+            def transcribe_faster(audios: list[np.ndarray]) -> list[str]:
+                texts = []
+                for audio_f32 in audios:
+                    segments, _info = fw_model.transcribe(
+                        audio_f32, language="en", task="transcribe", beam_size=1, vad_filter=False
+                    )
+                    texts.append("".join(seg.text for seg in segments).strip())
+                return texts
+
+            print(f"[transcribe] using faster-whisper ({compute_type})", flush=True)
+            return transcribe_faster
+        except Exception as e:
+            print(f"[transcribe] faster-whisper unavailable, using openai-whisper: {e}", file=sys.stderr, flush=True)
+
+    whisper_model = whisper.load_model(model_name, device=device, download_root=download_root)
+    # Half precision only where it is fast and supported; on CPU whisper would fall back to fp32 anyway.
+    fp16 = device == "cuda"
+    if fp16:
+        torch.set_float32_matmul_precision("high")
+    decode_options = whisper.DecodingOptions(language="en", task="transcribe", fp16=fp16, without_timestamps=True)
+    n_mels = whisper_model.dims.n_mels
+    # Persistent on-device mel batch; rows are overwritten per decode and it only grows for larger batches.
+    mel_buf = torch.empty(
+        (TRANSCRIBE_BATCH_MAX, n_mels, whisper.audio.N_FRAMES), dtype=torch.float32, device=whisper_model.device
+    )
+
+    def transcribe_one(audio_f32: np.ndarray) -> str:
+        result = whisper_model.transcribe(audio_f32, language="en", task="transcribe", fp16=fp16)
+        return result.get("text", "").strip()
+
+    def transcribe_openai(audios: list[np.ndarray]) -> list[str]:
+        nonlocal mel_buf
+        texts = [None] * len(audios)
+        # Utterances that fit one 30 s window skip transcribe()'s sliding-window setup: their mels are
+        # computed on the model device straight into mel_buf and decoded together in one forward.
+        short = [i for i, audio_f32 in enumerate(audios) if audio_f32.size <= whisper.audio.N_SAMPLES]
+        if short:
+            if mel_buf.shape[0] < len(short):
+                mel_buf = torch.empty(
+                    (len(short), *mel_buf.shape[1:]), dtype=mel_buf.dtype, device=mel_buf.device
+                )
+            for row, i in enumerate(short):
+                audio = whisper.pad_or_trim(torch.from_numpy(audios[i]).to(whisper_model.device))
+                mel_buf[row].copy_(whisper.log_mel_spectrogram(audio, n_mels=n_mels))
+            for i, result in zip(short, whisper_model.decode(mel_buf[: len(short)], decode_options)):
+                if result.no_speech_prob > 0.6 and result.avg_logprob <= -1.0:
+                    texts[i] = ""
+                elif result.compression_ratio <= 2.4 and result.avg_logprob > -1.0:
+                    texts[i] = result.text.strip()
+                # Otherwise leave it for transcribe(), which retries with temperature fallback.
+        for i, audio_f32 in enumerate(audios):
+            if texts[i] is None:
+                texts[i] = transcribe_one(audio_f32)
+        return texts
+
+    return transcribe_openai
+
+
+def _downmix_to_mono(audio_i16: np.ndarray, channels: int, scratch: np.ndarray = None) -> np.ndarray:
     if channels <= 1 or audio_i16.size == 0:
         return audio_i16
     remainder = audio_i16.size % channels
     if remainder:
         audio_i16 = audio_i16[: audio_i16.size - remainder]
-    frames = audio_i16.reshape(-1, channels).astype(np.float32)
-    return np.rint(frames.mean(axis=1)).astype(np.int16)
+    frames = audio_i16.reshape(-1, channels)
+    n = frames.shape[0]
+    # Integer sum + rounded divide: exact, and no float conversions. The float32 scratch has the
+    # same item size, so it is reused as the int32 accumulator.
+    if scratch is None or scratch.size < n:
+        mono = np.empty(n, dtype=np.int32)
+    else:
+        mono = scratch[:n].view(np.int32)
+    if channels == 2:
+        np.add(frames[:, 0], frames[:, 1], out=mono, dtype=np.int32)
+        mono += 1
+        mono >>= 1
+    else:
+        np.sum(frames, axis=1, dtype=np.int32, out=mono)
+        mono += channels // 2
+        np.floor_divide(mono, channels, out=mono)
+    return mono.astype(np.int16)
+
+
+@functools.lru_cache(maxsize=16)
+def _interp_table(src_len: int, dst_len: int):
+    """Left/right source indices and weights for linear interpolation; block sizes repeat, so cache."""
+    dst_x = np.linspace(0, src_len - 1, num=dst_len, dtype=np.float64)
+    idx_lo = np.floor(dst_x).astype(np.intp)
+    idx_hi = np.minimum(idx_lo + 1, src_len - 1)
+    frac = (dst_x - idx_lo).astype(np.float32)
+    for arr in (idx_lo, idx_hi, frac):
+        arr.flags.writeable = False
+    return idx_lo, idx_hi, frac
 
 
 def _resample_linear(audio_i16: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
     if src_rate == dst_rate or audio_i16.size == 0:
         return audio_i16
-    src_len = audio_i16.size
-    dst_len = int(round(src_len * float(dst_rate) / float(src_rate)))
-    if dst_len <= 1:
-        return audio_i16[:1]
-    src_x = np.arange(src_len, dtype=np.float32)
-    dst_x = np.linspace(0, src_len - 1, num=dst_len, dtype=np.float32)
-    resampled = np.interp(dst_x, src_x, audio_i16.astype(np.float32))
-    return np.rint(resampled).astype(np.int16)
+    return _resample_to_length(audio_i16, int(round(audio_i16.size * float(dst_rate) / float(src_rate))))
 
 
 def _resample_to_length(audio_i16: np.ndarray, target_len: int) -> np.ndarray:
     if audio_i16.size == 0 or target_len <= 0:
-        return np.array([], dtype=np.int16)
+        return _EMPTY_I16
     if audio_i16.size == target_len:
         return audio_i16
     if target_len == 1:
         return audio_i16[:1]
-    src_len = audio_i16.size
-    src_x = np.arange(src_len, dtype=np.float32)
-    dst_x = np.linspace(0, src_len - 1, num=target_len, dtype=np.float32)
-    resampled = np.interp(dst_x, src_x, audio_i16.astype(np.float32))
-    return np.rint(resampled).astype(np.int16)
+    idx_lo, idx_hi, frac = _interp_table(audio_i16.size, target_len)
+    lo = audio_i16[idx_lo]
+    resampled = np.subtract(audio_i16[idx_hi], lo, dtype=np.float32)
+    resampled *= frac
+    resampled += lo
+    np.rint(resampled, out=resampled)
+    return resampled.astype(np.int16)
 
 
-def _mix_audio(mic_i16: np.ndarray, loop_i16: np.ndarray) -> np.ndarray:
+def _mix_audio(mic_i16: np.ndarray, loop_i16: np.ndarray, scratch: np.ndarray = None) -> np.ndarray:
     if mic_i16.size == 0 and loop_i16.size == 0:
         return mic_i16
     if mic_i16.size == 0:
@@ -156,11 +586,14 @@ def _mix_audio(mic_i16: np.ndarray, loop_i16: np.ndarray) -> np.ndarray:
     length = min(mic_i16.size, loop_i16.size)
     if length <= 0:
         return mic_i16
-    mic_f = mic_i16[:length].astype(np.float32)
-    loop_f = loop_i16[:length].astype(np.float32)
-    mixed = 0.5 * (mic_f + loop_f)
-    mixed = np.clip(mixed, -32768, 32767)
-    return np.rint(mixed).astype(np.int16)
+    if scratch is None or scratch.size < length:
+        scratch = np.empty(length, dtype=np.float32)
+    # The mean of two int16 samples always fits in int16, so no clip is needed.
+    mixed = scratch[:length]
+    np.add(mic_i16[:length], loop_i16[:length], out=mixed, dtype=np.float32)
+    np.multiply(mixed, 0.5, out=mixed)
+    np.rint(mixed, out=mixed)
+    return mixed.astype(np.int16)
 
 
 def main():
@@ -169,7 +602,6 @@ def main():
         idx = sys.argv.index("--model")
         if idx + 1 < len(sys.argv):
             model_name = sys.argv[idx + 1]
-    pa = pyaudio.PyAudio()
     capture_channels = TARGET_CHANNELS
     capture_rate = TARGET_RATE
     input_chunk = TARGET_CHUNK
@@ -178,6 +610,14 @@ def main():
     if vad_model is None:
         print("[record] VAD model failed to load, exiting", file=sys.stderr, flush=True)
         sys.exit(5)
+    # Warm up the VAD so graph optimization / first-call allocation happens now, not on the first live block.
+    warmup = np.zeros(TARGET_CHUNK, dtype=np.float32)
+    for _ in range(2):
+        try:
+            _vad_prob(vad_model, warmup, TARGET_RATE)
+        except Exception as e:
+            print(f"[vad] warm-up failed: {e}", file=sys.stderr, flush=True)
+            break
     if hasattr(vad_model, "reset_states"):
         vad_model.reset_states()
 
@@ -185,27 +625,65 @@ def main():
     print(f"[transcribe] loading model {model_name} on {device}", flush=True)
     try:
         download_root = os.environ.get("WHISPER_ROOT")
-        whisper_model = whisper.load_model(model_name, device=device, download_root=download_root)
+        transcribe_audio = _load_transcriber(model_name, device, download_root)
     except Exception as e:
         print(f"[transcribe] failed to load model: {e}", file=sys.stderr, flush=True)
         sys.exit(3)
 
+    # PortAudio init is deferred until the models are loaded so the failure exits above never pay for it.
+    pa = pyaudio.PyAudio()
+
     chunk_ms = (TARGET_CHUNK / float(TARGET_RATE)) * 1000.0
     pre_pad_frames = max(0, int(VAD_PRE_PAD_MS / chunk_ms)) if chunk_ms > 0 else 0
     post_pad_frames = max(0, int(VAD_POST_PAD_MS / chunk_ms)) if chunk_ms > 0 else 0
     min_silence_frames = max(1, int(VAD_MIN_SILENCE_MS / chunk_ms)) if chunk_ms > 0 else 1
     min_speech_frames = max(1, int(VAD_MIN_SPEECH_MS / chunk_ms)) if chunk_ms > 0 else 1
     min_utterance_samples = int((VAD_MIN_SPEECH_MS / 1000.0) * TARGET_RATE)
+    merge_max_samples = UTTERANCE_MERGE_MAX_SEC * TARGET_RATE
+    tail_trim_window = int(TARGET_RATE * TAIL_TRIM_WINDOW_MS / 1000)
+    tail_trim_max = post_pad_frames * TARGET_CHUNK
 
     session_lock = threading.Lock()
     current_session = {"state": None}
+    session_ready = threading.Event()
     shutdown_event = threading.Event()
 
     def send(obj):
-        print(json.dumps(obj), flush=True)
+        _write_stdout(_dumps(obj) + b"\n")
 
     send({"event": "ready"})
 
+    # Opened capture streams are kept (stopped) between sessions and reused when the next session asks
+    # for the same device and format, skipping a full driver open. Guarded by session_lock.
+    stream_cache = {}
+
+    def take_cached_stream(key):
+        cached = stream_cache.pop(key, None)
+        if cached is None:
+            return None
+        stream, capture, channels = cached
+        capture.clear()
+        capture.dropped = 0
+        try:
+            stream.start_stream()
+        except Exception:
+            _close_streams(stream)
+            return None
+        return stream, capture, channels
+
+    def release_stream(key, stream, capture, channels):
+        if stream is None:
+            return
+        if key is None or key in stream_cache:
+            _close_streams(stream)
+            return
+        try:
+            stream.stop_stream()
+        except Exception:
+            _close_streams(stream)
+            return
+        stream_cache[key] = (stream, capture, channels)
+
     def start_session(out_path: str, transcript_path: str, device_index, loopback_device_index):
         nonlocal capture_channels, capture_rate, input_chunk
         device_info = pa.get_device_info_by_index(device_index) if device_index is not None else pa.get_default_input_device_info()
@@ -219,17 +697,26 @@ def main():
                 return
             os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
 
+            mic_key = ("mic", device_index, capture_rate, capture_channels, input_chunk)
+            cached = take_cached_stream(mic_key)
+            if cached is not None:
+                stream, mic_capture, capture_channels = cached
+            else:
+                stream = None
+                mic_capture = CaptureBuffer(int(np.ceil(CAPTURE_BACKLOG_SEC * capture_rate / input_chunk)))
             stream_kwargs = dict(
                 format=pyaudio.paInt16,
                 channels=capture_channels,
                 rate=capture_rate,
                 input=True,
                 frames_per_buffer=input_chunk,
+                stream_callback=mic_capture.callback,
             )
             if device_index is not None:
                 stream_kwargs["input_device_index"] = device_index
             try:
-                stream = pa.open(**stream_kwargs)
+                if stream is None:
+                    stream = pa.open(**stream_kwargs)
             except Exception as e:
                 if capture_channels > 1:
                     try:
@@ -243,6 +730,8 @@ def main():
                     send({"event": "error", "msg": f"failed to open input stream: {e}"})
                     return
             loopback_stream = None
+            loopback_capture = None
+            loopback_key = None
             loopback_rate = TARGET_RATE
             loopback_channels = TARGET_CHANNELS
             loopback_chunk = TARGET_CHUNK
@@ -251,16 +740,18 @@ def main():
                     loopback_info = pa.get_device_info_by_index(loopback_device_index)
                 except Exception as e:
                     send({"event": "error", "msg": f"failed to get loopback device info: {e}"})
-                    try:
-                        stream.stop_stream()
-                        stream.close()
-                    except Exception:
-                        pass
+                    _close_streams(stream)
                     return
                 loopback_rate = int(loopback_info.get("defaultSampleRate", TARGET_RATE))
-                loopback_channels = 2 if loopback_info.get("maxInputChannels", 0) >= 2 else 1
+                loopback_channels = 2 if int(loopback_info.get("maxInputChannels") or 0) >= 2 else 1
                 loopback_min_chunk = int(np.ceil(loopback_rate / 31.25))
                 loopback_chunk = max(loopback_min_chunk, int(np.ceil(loopback_rate * (TARGET_CHUNK / float(TARGET_RATE)))))
+                loopback_key = ("loopback", loopback_device_index, loopback_rate, loopback_channels, loopback_chunk)
+                cached = take_cached_stream(loopback_key)
+                if cached is not None:
+                    loopback_stream, loopback_capture, loopback_channels = cached
+                else:
+                    loopback_capture = CaptureBuffer(LOOPBACK_BACKLOG_BLOCKS)
                 loopback_kwargs = dict(
                     format=pyaudio.paInt16,
                     channels=loopback_channels,
@@ -268,11 +759,13 @@ def main():
                     input=True,
                     frames_per_buffer=loopback_chunk,
                     input_device_index=loopback_device_index,
+                    stream_callback=loopback_capture.callback,
                 )
                 try:
                     if sys.platform == "win32":
                         loopback_kwargs["as_loopback"] = True
-                    loopback_stream = pa.open(**loopback_kwargs)
+                    if loopback_stream is None:
+                        loopback_stream = pa.open(**loopback_kwargs)
                 except Exception as e:
                     if sys.platform == "win32" and "as_loopback" in loopback_kwargs:
                         try:
@@ -280,27 +773,25 @@ def main():
                             loopback_stream = pa.open(**loopback_kwargs)
                         except Exception as e2:
                             send({"event": "error", "msg": f"failed to open loopback stream: {e2}"})
-                            try:
-                                stream.stop_stream()
-                                stream.close()
-                            except Exception:
-                                pass
+                            _close_streams(stream)
                             return
                     else:
                         send({"event": "error", "msg": f"failed to open loopback stream: {e}"})
-                        try:
-                            stream.stop_stream()
-                            stream.close()
-                        except Exception:
-                            pass
+                        _close_streams(stream)
                         return
             sample_width = pa.get_sample_size(pyaudio.paInt16)
-            wf = wave.open(out_path, "wb")
-            wf.setnchannels(TARGET_CHANNELS)
-            wf.setsampwidth(sample_width)
-            wf.setframerate(TARGET_RATE)
+            try:
+                wf = PcmWavWriter(out_path, TARGET_CHANNELS, TARGET_RATE, sample_width)
+            except Exception as e:
+                send({"event": "error", "msg": f"failed to open output file: {e}"})
+                _close_streams(stream, loopback_stream)
+                return
             state = SessionState(out_path, transcript_path, stream, wf)
             state.loopback_stream = loopback_stream
+            state.mic_key = mic_key
+            state.loopback_key = loopback_key
+            state.mic_capture = mic_capture
+            state.loopback_capture = loopback_capture
             state.mic_channels = capture_channels
             state.loopback_channels = loopback_channels
             state.mic_rate = capture_rate
@@ -308,29 +799,49 @@ def main():
             state.mic_chunk = input_chunk
             state.loopback_chunk = loopback_chunk
             state.pre_buffer = collections.deque(maxlen=pre_pad_frames or 1)
+            # Size the float scratch for the largest interleaved block up front so it never regrows mid-session.
+            state.scratch_f32(max(input_chunk * capture_channels, loopback_chunk * loopback_channels))
             if hasattr(vad_model, "reset_states"):
                 vad_model.reset_states()
             current_session["state"] = state
+            session_ready.set()
 
             def transcribe_worker():
+                utterance_queue = state.utterance_queue
+                # One float32 buffer for the whole worker; each batch's utterances are scaled into
+                # consecutive slices of it and the buffer only grows when a batch outsizes it.
+                scratch = np.empty(TARGET_RATE * UTTERANCE_INITIAL_SEC, dtype=np.float32)
                 while True:
-                    item = state.utterance_queue.get()
+                    # Take whatever else is already queued so bursts are decoded as one batch.
+                    batch = [utterance_queue.get()]
+                    while batch[-1] is not None and len(batch) < TRANSCRIBE_BATCH_MAX:
+                        try:
+                            batch.append(utterance_queue.get_nowait())
+                        except queue.Empty:
+                            break
                     try:
-                        if item is None:
-                            return
-                        audio_i16 = item
-                        audio_f32 = audio_i16.astype(np.float32) / 32768.0
-                        result = whisper_model.transcribe(audio_f32, language="en", task="transcribe", fp16=False)
-                        text = result.get("text", "").strip()
-                        if text:
-                            with state.transcript_lock:
-                                state.transcript_parts.append(text)
-                                full_text = "\n".join([t for t in state.transcript_parts if t])
-                            send({"event": "partial", "text": text, "full_text": full_text})
+                        items = [item for item in batch if item is not None]
+                        total = sum(item.size for item in items)
+                        if scratch.size < total:
+                            scratch = np.empty(total, dtype=np.float32)
+                        audios = []
+                        pos = 0
+                        for item in items:
+                            audios.append(np.multiply(item, _I16_TO_F32, out=scratch[pos:pos + item.size], dtype=np.float32))
+                            pos += item.size
+                        for text in transcribe_audio(audios) if audios else ():
+                            if text:
+                                with state.transcript_lock:
+                                    state.transcript_parts.append(text)
+                                    full_text = "\n".join([t for t in state.transcript_parts if t])
+                                send({"event": "partial", "text": text, "full_text": full_text})
                     except Exception as e:
                         print(f"[transcribe] utterance error: {e}", file=sys.stderr, flush=True)
                     finally:
-                        state.utterance_queue.task_done()
+                        for _ in batch:
+                            utterance_queue.task_done()
+                    if batch[-1] is None:
+                        return
 
             state.worker = threading.Thread(target=transcribe_worker, daemon=True)
             state.worker.start()
@@ -344,161 +855,229 @@ def main():
                     send({"event": "error", "msg": "no active session"})
                 return
             state.stop_event.set()
+            # Wake the recording loop if it is parked waiting for the next mic block.
+            state.mic_capture.ready.set()
         state.done_event.wait(timeout=30)
 
     def pause_session():
         with session_lock:
             state = current_session["state"]
             if state:
-                state.paused = True
+                state.pause_event.set()
 
     def resume_session():
         with session_lock:
             state = current_session["state"]
             if state:
-                state.paused = False
+                state.pause_event.clear()
 
-    def finalize_utterance(state: SessionState, frames: list[np.ndarray]):
-        if not frames:
+    def finalize_utterance(state: SessionState):
+        if not state.utterance.size:
             return
-        audio_i16 = np.concatenate(frames)
+        audio_i16 = _trim_silent_tail(state.utterance.take(), tail_trim_max, tail_trim_window, TAIL_TRIM_RMS)
         if audio_i16.size < min_utterance_samples:
             return
-        state.utterance_queue.put(audio_i16)
+        utterance_queue = state.utterance_queue
+        held = state.held_utterance
+        if held is not None:
+            if held.size + audio_i16.size <= merge_max_samples:
+                state.held_utterance = np.concatenate((held, audio_i16))
+                return
+            # The held clip already fills a Whisper window: queue it if there is room now, else drop it.
+            state.held_utterance = None
+            try:
+                utterance_queue.put_nowait(held)
+            except queue.Full:
+                state.dropped_utterances += 1
+                send({"event": "warning", "msg": f"transcription is falling behind; dropped {state.dropped_utterances} utterances"})
+        try:
+            utterance_queue.put_nowait(audio_i16)
+            return
+        except queue.Full:
+            pass
+        # Whisper is behind realtime: hold this utterance outside the full queue and merge the next ones
+        # into it, up to one Whisper window, so the backlog stays bounded and transcript order is kept.
+        state.held_utterance = audio_i16
+        if not state.backlog_warned:
+            state.backlog_warned = True
+            send({"event": "warning", "msg": "transcription is falling behind; merging queued utterances"})
+
+    def flush_held_utterance(state: SessionState, block: bool = False):
+        held = state.held_utterance
+        if held is None:
+            return
+        try:
+            state.utterance_queue.put(held, block=block)
+        except queue.Full:
+            return
+        state.held_utterance = None
 
     def recording_loop():
         while not shutdown_event.is_set():
-            with session_lock:
-                state = current_session["state"]
+            # start_session publishes the state before setting the event, and only this thread clears
+            # it, so the read needs no lock; the timeout just bounds how late shutdown is noticed.
+            if not session_ready.wait(timeout=0.25):
+                continue
+            state = current_session["state"]
             if state is None:
-                time.sleep(0.05)
+                session_ready.clear()
                 continue
 
-            while not state.stop_event.is_set() and not shutdown_event.is_set():
-                if state.paused:
-                    try:
-                        if state.stream.is_active():
-                            state.stream.stop_stream()
-                    except Exception:
-                        pass
-                    if state.loopback_stream is not None:
-                        try:
-                            if state.loopback_stream.is_active():
-                                state.loopback_stream.stop_stream()
-                        except Exception:
-                            pass
-                    if hasattr(vad_model, "reset_states"):
-                        vad_model.reset_states()
-                    state.pre_buffer.clear()
-                    state.silence_buffer.clear()
-                    state.utterance_frames.clear()
-                    state.speaking = False
-                    state.speech_run = 0
-                    time.sleep(0.05)
+            stop_is_set = state.stop_event.is_set
+            pause_is_set = state.pause_event.is_set
+            streams_active = True  # PyAudio starts callback streams on open
+            shutdown_is_set = shutdown_event.is_set
+            pop_mic = state.mic_capture.pop
+            pop_loopback = state.loopback_capture.pop if state.loopback_capture is not None else None
+            wf = state.wf
+            write_audio = wf.write
+            bytes_per_sec = TARGET_RATE * TARGET_CHANNELS * wf.sample_width
+            mic_channels, mic_rate = state.mic_channels, state.mic_rate
+            loopback_channels, loopback_rate = state.loopback_channels, state.loopback_rate
+            scratch = state.scratch_f32
+            vad_input = state.vad_input
+            vad_windows = state.vad_windows
+            frombuffer, int16 = np.frombuffer, np.int16
+            downmix, resample, mix = _downmix_to_mono, _resample_linear, _mix_audio
+            # Segmenter thresholds are fixed for the session; bind them as plain locals.
+            target_rate, speech_threshold = TARGET_RATE, VAD_THRESHOLD
+            min_speech, min_silence = min_speech_frames, min_silence_frames
+            pre_pad, post_pad = pre_pad_frames, post_pad_frames
+            vad_prob = _vad_prob
+            utterance = state.utterance
+            skip_vad = False
+            dot = np.dot
+            noise_gate = float(VAD_NOISE_GATE_RMS * _I16_TO_F32) ** 2
+            while not stop_is_set() and not shutdown_is_set():
+                if pause_is_set():
+                    # Streams are only touched on pause/resume transitions, not polled every block.
+                    if streams_active:
+                        for stream in (state.stream, state.loopback_stream):
+                            if stream is None:
+                                continue
+                            try:
+                                stream.stop_stream()
+                            except Exception:
+                                pass
+                        streams_active = False
+                        if hasattr(vad_model, "reset_states"):
+                            vad_model.reset_states()
+                        state.mic_capture.clear()
+                        if state.loopback_capture is not None:
+                            state.loopback_capture.clear()
+                        state.pre_buffer.clear()
+                        state.silence_buffer.clear()
+                        state.utterance.clear()
+                        state.vad_carry_fill = 0
+                        state.speaking = False
+                        state.speech_run = 0
+                    state.stop_event.wait(0.05)
                     continue
-                else:
-                    try:
-                        if not state.stream.is_active():
-                            state.stream.start_stream()
-                    except Exception:
-                        pass
-                    if state.loopback_stream is not None:
+                if not streams_active:
+                    for stream in (state.stream, state.loopback_stream):
+                        if stream is None:
+                            continue
                         try:
-                            if not state.loopback_stream.is_active():
-                                state.loopback_stream.start_stream()
+                            stream.start_stream()
                         except Exception:
                             pass
+                    streams_active = True
 
-                mic_data = state.stream.read(state.mic_chunk, exception_on_overflow=False)
-                mic_i16 = np.frombuffer(mic_data, dtype=np.int16)
-                mic_i16 = _downmix_to_mono(mic_i16, state.mic_channels)
-                mic_i16 = _resample_linear(mic_i16, state.mic_rate, TARGET_RATE)
+                mic_data = pop_mic(timeout=0.1)
+                if mic_data is None:
+                    continue
+                mic_i16 = frombuffer(mic_data, dtype=int16)
+                mic_i16 = downmix(mic_i16, mic_channels, scratch(mic_i16.size))
+                mic_i16 = resample(mic_i16, mic_rate, target_rate)
 
-                loop_i16 = np.array([], dtype=np.int16)
-                if state.loopback_stream is not None:
-                    try:
-                        available = state.loopback_stream.get_read_available()
-                    except Exception:
-                        available = state.loopback_chunk
-                    if available > 0:
+                loop_i16 = _EMPTY_I16
+                if pop_loopback is not None:
+                    loop_data = pop_loopback()
+                    if loop_data is not None:
                         try:
-                            frames = min(available, state.loopback_chunk)
-                            loop_data = state.loopback_stream.read(frames, exception_on_overflow=False)
-                            loop_i16 = np.frombuffer(loop_data, dtype=np.int16)
-                            loop_i16 = _downmix_to_mono(loop_i16, state.loopback_channels)
-                            loop_i16 = _resample_linear(loop_i16, state.loopback_rate, TARGET_RATE)
+                            loop_i16 = frombuffer(loop_data, dtype=int16)
+                            loop_i16 = downmix(loop_i16, loopback_channels, scratch(loop_i16.size))
+                            loop_i16 = resample(loop_i16, loopback_rate, target_rate)
                             if mic_i16.size > 0 and loop_i16.size > 0 and loop_i16.size != mic_i16.size:
                                 loop_i16 = _resample_to_length(loop_i16, mic_i16.size)
                         except Exception:
-                            loop_i16 = np.array([], dtype=np.int16)
-
-                audio_i16 = _mix_audio(mic_i16, loop_i16)
-                if audio_i16.size:
-                    state.wf.writeframes(audio_i16.tobytes())
+                            loop_i16 = _EMPTY_I16
 
+                audio_i16 = mix(mic_i16, loop_i16, scratch(mic_i16.size))
                 if audio_i16.size == 0:
                     continue
-                audio_f32 = audio_i16.astype(np.float32) / 32768.0
-                speech_prob = _vad_prob(vad_model, audio_f32, TARGET_RATE)
-                is_speech = speech_prob >= VAD_THRESHOLD
-
-                if not state.speaking:
-                    state.pre_buffer.append(audio_i16)
-                    if is_speech:
-                        state.speech_run += 1
+                write_audio(audio_i16)
+                for audio_i16 in vad_windows(audio_i16):
+                    # While idle (no speech run in progress) only every other block goes through the VAD;
+                    # the skipped block still lands in the pre-roll, so onsets lose at most one block of latency.
+                    idle = not state.speaking and state.speech_run == 0
+                    if idle and skip_vad:
+                        is_speech = False
                     else:
-                        state.speech_run = 0
-                    if state.speech_run >= min_speech_frames:
-                        state.speaking = True
-                        state.utterance_frames = list(state.pre_buffer)
-                        state.pre_buffer.clear()
-                        state.silence_buffer = []
-                else:
-                    if is_speech:
-                        if state.silence_buffer:
-                            state.utterance_frames.extend(state.silence_buffer)
+                        vad_tensor = vad_input(audio_i16)
+                        vad_f32 = state.vad_f32
+                        # Energy pre-gate: near-silent blocks cannot be speech, so skip the model for them.
+                        if dot(vad_f32, vad_f32) < noise_gate * vad_f32.size:
+                            is_speech = False
+                        else:
+                            is_speech = vad_prob(vad_model, vad_tensor, target_rate) >= speech_threshold
+                    skip_vad = idle and not skip_vad
+
+                    if not state.speaking:
+                        state.pre_buffer.append(audio_i16)
+                        if is_speech:
+                            state.speech_run += 1
+                        else:
+                            state.speech_run = 0
+                        if state.speech_run >= min_speech:
+                            state.speaking = True
+                            utterance.clear()
+                            utterance.extend(state.pre_buffer)
+                            state.pre_buffer.clear()
                             state.silence_buffer = []
-                        state.utterance_frames.append(audio_i16)
                     else:
-                        state.silence_buffer.append(audio_i16)
-                        if len(state.silence_buffer) >= min_silence_frames:
-                            if post_pad_frames > 0:
-                                state.utterance_frames.extend(state.silence_buffer[:post_pad_frames])
-                            finalize_utterance(state, state.utterance_frames)
-                            tail = state.silence_buffer[-pre_pad_frames:] if pre_pad_frames > 0 else []
-                            state.pre_buffer = collections.deque(tail, maxlen=pre_pad_frames or 1)
-                            state.silence_buffer = []
-                            state.utterance_frames = []
-                            state.speaking = False
-                            state.speech_run = 0
+                        if is_speech:
+                            if state.silence_buffer:
+                                utterance.extend(state.silence_buffer)
+                                state.silence_buffer = []
+                            utterance.append(audio_i16)
+                        else:
+                            state.silence_buffer.append(audio_i16)
+                            if len(state.silence_buffer) >= min_silence:
+                                if post_pad > 0:
+                                    utterance.extend(state.silence_buffer[:post_pad])
+                                finalize_utterance(state)
+                                tail = state.silence_buffer[-pre_pad:] if pre_pad > 0 else []
+                                state.pre_buffer = collections.deque(tail, maxlen=pre_pad or 1)
+                                state.silence_buffer = []
+                                state.speaking = False
+                                state.speech_run = 0
 
-                elapsed = time.time() - state.start_t
-                if elapsed - state.last_print >= 1.0:
-                    state.last_print = elapsed
-                    print(f"[record] seconds={int(elapsed)}", flush=True)
+                elapsed_sec = wf.data_bytes // bytes_per_sec
+                if elapsed_sec != state.last_print_sec:
+                    state.last_print_sec = elapsed_sec
+                    _write_stdout(b"[record] seconds=%d\n" % elapsed_sec)
+                    if state.held_utterance is not None:
+                        flush_held_utterance(state)
+                    # Checked on the once-per-second tick so a falling-behind loop warns at most once a second.
+                    # Loopback drops are the intended lag trimming (see LOOPBACK_BACKLOG_BLOCKS), not a stall.
+                    dropped = state.mic_capture.dropped
+                    if dropped != state.dropped_reported:
+                        send({"event": "warning", "msg": f"audio capture fell behind; dropped {dropped - state.dropped_reported} blocks"})
+                        state.dropped_reported = dropped
 
-            try:
-                state.stream.stop_stream()
-                state.stream.close()
-            except Exception:
-                pass
-            if state.loopback_stream is not None:
-                try:
-                    state.loopback_stream.stop_stream()
-                    state.loopback_stream.close()
-                except Exception:
-                    pass
-            try:
-                state.wf.close()
-            except Exception:
-                pass
+            with session_lock:
+                release_stream(state.mic_key, state.stream, state.mic_capture, state.mic_channels)
+                release_stream(state.loopback_key, state.loopback_stream, state.loopback_capture, state.loopback_channels)
+            # The writer thread drains and patches the header while the last utterance transcribes.
+            state.wf.close(wait=False)
 
-            if state.silence_buffer and state.utterance_frames:
+            if state.silence_buffer and state.utterance.size:
                 if post_pad_frames > 0:
-                    state.utterance_frames.extend(state.silence_buffer[:post_pad_frames])
-            if state.utterance_frames:
-                finalize_utterance(state, state.utterance_frames)
+                    state.utterance.extend(state.silence_buffer[:post_pad_frames])
+            finalize_utterance(state)
 
+            flush_held_utterance(state, block=True)
             state.utterance_queue.put(None)
             state.utterance_queue.join()
             if state.worker:
@@ -511,13 +1090,18 @@ def main():
             except Exception as e:
                 print(f"[transcribe] failed to write transcript: {e}", file=sys.stderr, flush=True)
 
+            state.wf.close()
             send({"event": "done", "out": state.transcript_path, "text": full_text})
 
             with session_lock:
                 if current_session["state"] is state:
                     current_session["state"] = None
+                    session_ready.clear()
             state.done_event.set()
 
+        with session_lock:
+            _close_streams(*(stream for stream, _capture, _channels in stream_cache.values()))
+            stream_cache.clear()
         try:
             pa.terminate()
         except Exception:
@@ -565,20 +1149,34 @@ def main():
             send({"event": "error", "msg": f"unknown cmd: {cmd}"})
 
     def _handle_signal(signum, frame):
+        # Only flag the shutdown here; the main thread below does the blocking teardown.
         shutdown_event.set()
-        stop_session(emit_error=False)
 
     signal.signal(signal.SIGTERM, _handle_signal)
     signal.signal(signal.SIGINT, _handle_signal)
 
+    def stdin_loop():
+        # Runs on a daemon thread: an uncaught error here would leave the main thread waiting forever,
+        # so report failed commands and keep reading, and always release the main thread on exit.
+        try:
+            for line in sys.stdin:
+                try:
+                    handle_command(line)
+                except Exception as e:
+                    print(f"[record] command failed: {e}", file=sys.stderr, flush=True)
+                    send({"event": "error", "msg": f"command failed: {e}"})
+                if shutdown_event.is_set():
+                    break
+        finally:
+            shutdown_event.set()
+
     rec_thread = threading.Thread(target=recording_loop, daemon=True)
     rec_thread.start()
+    threading.Thread(target=stdin_loop, daemon=True).start()
 
-    for line in sys.stdin:
-        handle_command(line)
-        if shutdown_event.is_set():
-            break
-
+    while not shutdown_event.wait(timeout=0.5):
+        pass
+    stop_session(emit_error=False)
     rec_thread.join(timeout=5.0)
 
 
@@ -14,7 +14,10 @@ import sys
 def emit(event: str, message: str, **fields):
     payload = {"event": event, "message": message}
     payload.update(fields)
-    print(json.dumps(payload), flush=True)
+    # Each event is a UI progress update, so it is flushed immediately; encode once and write bytes.
+    out = sys.stdout.buffer
+    out.write(json.dumps(payload, separators=(",", ":")).encode("utf-8") + b"\n")
+    out.flush()
 
 
 def check_imports():
@@ -31,13 +34,7 @@ def check_imports():
 
 
 def ensure_whisper_model(model_name: str, download_root: str = None):
-    emit("status", f"downloading whisper model {model_name}")
-    try:
-        import whisper
-    except Exception as exc:
-        emit("error", f"failed to import whisper: {exc}")
-        sys.exit(3)
-
+    # Check the checkpoint on disk first; whisper (and torch behind it) is only imported to download.
     model_file = None
     if download_root:
         model_file = os.path.join(download_root, f"{model_name}.pt")
@@ -45,6 +42,13 @@ def ensure_whisper_model(model_name: str, download_root: str = None):
             emit("status", f"whisper model already present: {model_name}")
             return
 
+    emit("status", f"downloading whisper model {model_name}")
+    try:
+        import whisper
+    except Exception as exc:
+        emit("error", f"failed to import whisper: {exc}")
+        sys.exit(3)
+
     try:
         whisper.load_model(model_name, download_root=download_root)
     except Exception as exc:
@@ -75,6 +79,22 @@ def ensure_vad_model():
         emit("error", f"vad model load failed: {exc}")
         sys.exit(7)
 
+    # The recorder prefers the ONNX export when onnxruntime is installed; make sure it loads too.
+    try:
+        import onnxruntime  # noqa: F401
+    except Exception:
+        return
+    try:
+        torch.hub.load(
+            repo_or_dir="snakers4/silero-vad",
+            model="silero_vad",
+            trust_repo=True,
+            force_reload=False,
+            onnx=True,
+        )
+    except Exception as exc:
+        emit("status", f"onnx vad unavailable, recorder will use torchscript: {exc}")
+
 
 def main():
     parser = argparse.ArgumentParser()
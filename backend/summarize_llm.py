@@ -10,19 +10,32 @@ This script summarizes the transcript in a single pass.
 """
 
 import argparse
+import itertools
 import os
 import re
+import struct
 import sys
+from typing import Optional
 
 try:
     from llama_cpp import Llama
 except Exception as e:
     print(f"Failed to import llama_cpp: {e}", file=sys.stderr)
     sys.exit(1)
+try:
+    from llama_cpp import llama_supports_gpu_offload
+except Exception:
+    def llama_supports_gpu_offload() -> bool:
+        return False
+
 
+WORD_RE = re.compile(r"\S+")
 
-def count_words(text: str) -> int:
-    return len(text.split())
+
+def count_words(text: str, limit: Optional[int] = None) -> int:
+    # Only ever compared against the min-words threshold, so stop scanning once `limit` words are
+    # seen instead of splitting a multi-MB transcript into a throwaway list.
+    return sum(1 for _ in itertools.islice(WORD_RE.finditer(text), limit))
 
 
 def min_words_from_env(default: int) -> int:
@@ -47,6 +60,11 @@ SUMMARY_EXPANSION_SUFFIX = (
 )
 EXPANDED_SUMMARY_PROMPT = DEFAULT_PROMPT + SUMMARY_EXPANSION_SUFFIX
 MIN_SUMMARY_SENTENCES = 5
+SUMMARY_MAX_TOKENS = 512
+# The prompt ends with "Summary:"; a model that starts a new labelled section has finished the summary
+# and would otherwise keep generating until max_tokens.
+SUMMARY_STOP = ["\n\nTranscript:", "\n\nSummary:"]
+AUTO_N_CTX_MAX = 8192
 ACTION_ITEMS_MARKER = "Action Items:"
 SENTENCE_SPLIT_RE = re.compile(r"[^.!?]+[.!?]*")
 
@@ -54,11 +72,11 @@ SENTENCE_SPLIT_RE = re.compile(r"[^.!?]+[.!?]*")
 def summarize_with_llm(client: Llama, text: str, prompt: str, max_tokens: int = 256) -> str:
     full_prompt = prompt + "\n\nTranscript:\n" + text + "\n\nSummary:\n"
     if hasattr(client, "create_completion"):
-        resp = client.create_completion(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2)
+        resp = client.create_completion(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP)
     elif hasattr(client, "create"):
-        resp = client.create(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2)
+        resp = client.create(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP)
     else:
-        resp = client(full_prompt, max_tokens=max_tokens, temperature=0.2)
+        resp = client(full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP)
     return resp.get("choices", [{}])[0].get("text", "").strip()
 
 
@@ -71,15 +89,14 @@ def count_summary_sentences(text: str) -> int:
     body = extract_summary_body(text).strip()
     if not body:
         return 0
-    matches = SENTENCE_SPLIT_RE.findall(body)
-    return sum(1 for match in matches if match.strip())
+    return sum(1 for match in SENTENCE_SPLIT_RE.finditer(body) if not match.group().isspace())
 
 
 def ensure_min_sentences(summary: str, transcript: str, client: Llama) -> str:
     if count_summary_sentences(summary) >= MIN_SUMMARY_SENTENCES:
         return summary
     try:
-        expanded = summarize_with_llm(client, transcript, EXPANDED_SUMMARY_PROMPT, max_tokens=512)
+        expanded = summarize_with_llm(client, transcript, EXPANDED_SUMMARY_PROMPT, max_tokens=SUMMARY_MAX_TOKENS)
         if expanded:
             return expanded
     except Exception as e:
@@ -87,16 +104,116 @@ def ensure_min_sentences(summary: str, transcript: str, client: Llama) -> str:
     return summary
 
 
-def create_llama(model_path: str, n_ctx: int) -> Llama:
+def llama_kwargs_from_env() -> dict:
+    # Unset variables keep llama-cpp-python's own defaults.
+    kwargs = {}
+    raw_threads = os.getenv("SUM_N_THREADS", "").strip()
+    if raw_threads.isdigit() and int(raw_threads) > 0:
+        kwargs["n_threads"] = int(raw_threads)
+    raw_batch = os.getenv("SUM_N_BATCH", "").strip()
+    if raw_batch.isdigit() and int(raw_batch) > 0:
+        kwargs["n_batch"] = int(raw_batch)
+    # Offload every layer when llama.cpp was built with CUDA/Metal/Vulkan; CPU-only wheels report False.
+    # SUM_N_GPU_LAYERS overrides it (0 keeps the model on the CPU, -1 offloads everything).
+    raw_gpu_layers = os.getenv("SUM_N_GPU_LAYERS", "").strip()
     try:
-        return Llama(model_path=model_path, n_ctx=n_ctx)
-    except TypeError:
-        return Llama(model_path=model_path)
+        kwargs["n_gpu_layers"] = int(raw_gpu_layers)
+    except ValueError:
+        try:
+            if llama_supports_gpu_offload():
+                kwargs["n_gpu_layers"] = -1
+        except Exception:
+            pass
+    return kwargs
+
+
+# GGUF metadata value types: fixed-size scalars by struct format, plus 8 = string and 9 = array.
+_GGUF_SCALARS = {0: "B", 1: "b", 2: "H", 3: "h", 4: "I", 5: "i", 6: "f", 7: "?", 10: "Q", 11: "q", 12: "d"}
+
+
+def gguf_context_length(model_path: str) -> Optional[int]:
+    """Trained context length (`<arch>.context_length`) from a GGUF header, or None if unavailable.
+
+    Only the metadata key/value section is scanned, and it stops as soon as the key is found, so this
+    costs a few small reads instead of a model load.
+    """
+    try:
+        with open(model_path, "rb") as f:
+            if f.read(4) != b"GGUF":
+                return None
+            (version,) = struct.unpack("<I", f.read(4))
+            size_fmt = "<I" if version == 1 else "<Q"
+            size_len = struct.calcsize(size_fmt)
+
+            def read_size():
+                return struct.unpack(size_fmt, f.read(size_len))[0]
+
+            def read_str():
+                return f.read(read_size()).decode("utf-8", errors="replace")
+
+            def skip_value(vtype):
+                if vtype == 8:
+                    f.seek(read_size(), os.SEEK_CUR)
+                elif vtype == 9:
+                    (item_type,) = struct.unpack("<I", f.read(4))
+                    count = read_size()
+                    if item_type in _GGUF_SCALARS:
+                        f.seek(count * struct.calcsize(_GGUF_SCALARS[item_type]), os.SEEK_CUR)
+                    else:
+                        for _ in range(count):
+                            skip_value(item_type)
+                else:
+                    f.seek(struct.calcsize(_GGUF_SCALARS[vtype]), os.SEEK_CUR)
+
+            read_size()  # tensor count
+            kv_count = read_size()
+            arch = None
+            lengths = {}
+            for _ in range(kv_count):
+                key = read_str()
+                (vtype,) = struct.unpack("<I", f.read(4))
+                if key == "general.architecture" and vtype == 8:
+                    arch = read_str()
+                elif key.endswith(".context_length") and vtype in _GGUF_SCALARS:
+                    fmt = "<" + _GGUF_SCALARS[vtype]
+                    (lengths[key],) = struct.unpack(fmt, f.read(struct.calcsize(fmt)))
+                else:
+                    skip_value(vtype)
+                if arch and f"{arch}.context_length" in lengths:
+                    return int(lengths[f"{arch}.context_length"]) or None
+    except Exception:
+        return None
+    return None
+
+
+def estimate_n_ctx(text: str, default: int, model_ctx: Optional[int] = None) -> int:
+    """Smallest context (multiple of 256, within [default, AUTO_N_CTX_MAX]) that fits prompt, transcript and reply.
+
+    English averages roughly four characters per token; three keeps a safety margin for names and numbers.
+    The result never exceeds model_ctx, the model's trained context, when it is known.
+    """
+    needed = (len(EXPANDED_SUMMARY_PROMPT) + len(text)) // 3 + SUMMARY_MAX_TOKENS + 64
+    needed = -(-needed // 256) * 256
+    n_ctx = max(default, min(needed, AUTO_N_CTX_MAX))
+    return min(n_ctx, model_ctx) if model_ctx else n_ctx
+
+
+def create_llama(model_path: str, n_ctx: int) -> Llama:
+    kwargs = {"n_ctx": n_ctx, **llama_kwargs_from_env()}
+    while True:
+        try:
+            return Llama(model_path=model_path, **kwargs)
+        except TypeError as e:
+            # Older llama-cpp-python builds reject some kwargs; drop only the one named in the error.
+            match = re.search(r"keyword argument '(\w+)'", str(e))
+            if not match or match.group(1) not in kwargs:
+                raise
+            kwargs.pop(match.group(1))
 
 
 def summarize_direct(model_path: str, text: str, n_ctx: int = 2048):
     client = create_llama(model_path, n_ctx)
-    summary = summarize_with_llm(client, text, DEFAULT_PROMPT, max_tokens=512)
+    summary = summarize_with_llm(client, text, DEFAULT_PROMPT, max_tokens=SUMMARY_MAX_TOKENS)
     return client, summary
 
 
@@ -131,7 +248,7 @@ def main():
         min_words = args.min_words
     else:
         min_words = min_words_from_env(default_min_words)
-    if count_words(text) < min_words:
+    if count_words(text, limit=min_words) < min_words:
         summary = "Not enough content to summarize.\nAction Items: none."
         if args.out:
             os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
@@ -142,7 +259,7 @@ def main():
             print(summary)
         return
 
-    # Run hierarchical summarization
+    # Single pass: without an explicit size, the context grows to fit the whole transcript.
     env_n_ctx = os.getenv("SUM_N_CTX", "").strip()
     default_n_ctx = 2048
     if args.n_ctx and args.n_ctx > 0:
@@ -150,7 +267,7 @@ def main():
     elif env_n_ctx.isdigit():
         n_ctx = int(env_n_ctx)
     else:
-        n_ctx = default_n_ctx
+        n_ctx = estimate_n_ctx(text, default_n_ctx, gguf_context_length(args.model_path))
 
     client, summary = summarize_direct(args.model_path, text, n_ctx=n_ctx)
     summary = ensure_min_sentences(summary, text, client)
@@ -28,22 +28,37 @@ import threading
 import time
 from typing import Callable, Optional
 
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
 try:
     from llama_cpp import Llama
 except Exception as e:
     print(json.dumps({"event": "error", "msg": f"failed to import llama_cpp: {e}"}))
     sys.exit(1)
-
-
-def count_words(text: str) -> int:
-    return len(text.split())
-
-
-def min_words_from_env(default: int) -> int:
-    raw = os.getenv("SUM_MIN_WORDS", "").strip()
-    if raw.isdigit():
-        return max(int(raw), 1)
-    return default
+try:
+    from llama_cpp import LlamaRAMCache
+except Exception:
+    LlamaRAMCache = None
+
+# Model loading, word/sentence counting and the shared prompt pieces live in the one-shot script next to
+# this file; llama_cpp has imported by this point, so that module's own import guard cannot fire.
+from summarize_llm import (
+    MIN_SUMMARY_SENTENCES,
+    SUMMARY_EXPANSION_SUFFIX,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_STOP,
+    count_summary_sentences,
+    count_words,
+    create_llama,
+    min_words_from_env,
+)
 
 
 def clamp_temperature(value: float) -> float:
@@ -62,6 +77,13 @@ def temperature_from_env(default: float) -> float:
         return default
 
 
+def prompt_cache_bytes_from_env(default_mb: int) -> int:
+    raw = os.getenv("SUM_PROMPT_CACHE_MB", "").strip()
+    if raw.isdigit():
+        return int(raw) * 1024 * 1024
+    return default_mb * 1024 * 1024
+
+
 def max_tokens_from_env(default: int) -> int:
     raw = os.getenv("FOLLOWUP_MAX_TOKENS", "").strip()
     if raw.isdigit():
@@ -78,14 +100,7 @@ DEFAULT_PROMPT = (
     "Only report a task if it is directly supported by something that happened in the transcript or summary; if no real follow-up is required, write 'Action Items: none.'\n"
     "When you do list actions, mention the topic or person from the transcript that justifies that task so it is clearly traceable.\n"
 )
-SUMMARY_EXPANSION_SUFFIX = (
-    "\nIf the paragraph still has fewer than five sentences, rewrite it so the summary paragraph contains 5-7 sentences, "
-    "adding more detail from the transcript while keeping the Action Items section as instructed."
-)
 EXPANDED_SUMMARY_PROMPT = DEFAULT_PROMPT + SUMMARY_EXPANSION_SUFFIX
-MIN_SUMMARY_SENTENCES = 5
-ACTION_ITEMS_MARKER = "Action Items:"
-SENTENCE_SPLIT_RE = re.compile(r"[^.!?]+[.!?]*")
 
 FOLLOWUP_PROMPT = (
     "You are an assistant that drafts a warm, professional follow-up email after a student support session.\n"
@@ -108,19 +123,6 @@ def clean_followup_email(text: str) -> str:
     return cleaned
 
 
-def extract_summary_body(text: str) -> str:
-    idx = text.find(ACTION_ITEMS_MARKER)
-    return text[:idx] if idx != -1 else text
-
-
-def count_summary_sentences(text: str) -> int:
-    body = extract_summary_body(text).strip()
-    if not body:
-        return 0
-    matches = SENTENCE_SPLIT_RE.findall(body)
-    return sum(1 for match in matches if match.strip())
-
-
 def summarize_with_llm(
     client: Llama,
     text: str,
@@ -132,11 +134,11 @@ def summarize_with_llm(
     if on_delta:
         try:
             if hasattr(client, "create_completion"):
-                resp = client.create_completion(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2, stream=True)
+                resp = client.create_completion(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP, stream=True)
             elif hasattr(client, "create"):
-                resp = client.create(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2, stream=True)
+                resp = client.create(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP, stream=True)
             else:
-                resp = client(full_prompt, max_tokens=max_tokens, temperature=0.2, stream=True)
+                resp = client(full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP, stream=True)
             collected = ""
             for chunk in resp:
                 chunk_text = chunk.get("choices", [{}])[0].get("text", "")
@@ -166,11 +168,11 @@ def summarize_with_llm(
         except Exception:
             pass
     if hasattr(client, "create_completion"):
-        resp = client.create_completion(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2)
+        resp = client.create_completion(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP)
     elif hasattr(client, "create"):
-        resp = client.create(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2)
+        resp = client.create(prompt=full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP)
     else:
-        resp = client(full_prompt, max_tokens=max_tokens, temperature=0.2)
+        resp = client(full_prompt, max_tokens=max_tokens, temperature=0.2, stop=SUMMARY_STOP)
     return resp.get("choices", [{}])[0].get("text", "").strip()
 
 
@@ -206,14 +208,7 @@ def summarize_direct(
 ) -> str:
     if on_progress:
         on_progress("summarizing transcript")
-    return summarize_with_llm(client, text, DEFAULT_PROMPT, max_tokens=512, on_delta=on_stream)
-
-
-def create_llama(model_path: str, n_ctx: int) -> Llama:
-    try:
-        return Llama(model_path=model_path, n_ctx=n_ctx)
-    except TypeError:
-        return Llama(model_path=model_path)
+    return summarize_with_llm(client, text, DEFAULT_PROMPT, max_tokens=SUMMARY_MAX_TOKENS, on_delta=on_stream)
 
 
 class SummarizerDaemon:
@@ -226,17 +221,44 @@ class SummarizerDaemon:
         self.load_model(model_path)
 
     def send(self, obj):
-        print(json.dumps(obj), flush=True)
+        # summary_delta fires per generated token, so encode with orjson when available and
+        # write the bytes straight to stdout's buffer.
+        out = sys.stdout.buffer
+        out.write(_dumps(obj) + b"\n")
+        out.flush()
 
     def load_model(self, model_path: str):
         with self.lock:
+            if self.client is not None and model_path == self.model_path:
+                # Already resident; re-mmapping the weights and reallocating the KV cache buys nothing.
+                self.send({"event": "loaded", "model": model_path})
+                return
             try:
                 self.send({"event": "progress", "msg": f"loading model {model_path} (n_ctx={self.n_ctx})"})
-                self.client = create_llama(model_path, self.n_ctx)
-                self.model_path = model_path
-                self.send({"event": "loaded", "model": model_path})
+                client = create_llama(model_path, self.n_ctx)
             except Exception as e:
+                # The previous model (if any) stays loaded and keeps serving requests.
                 self.send({"event": "error", "msg": f"failed to load model: {e}"})
+                return
+            self.enable_prompt_cache(client)
+            previous, self.client = self.client, client
+            self.model_path = model_path
+            # Free the replaced model's weights and KV cache now rather than whenever it is collected.
+            if previous is not None and hasattr(previous, "close"):
+                previous.close()
+            self.send({"event": "loaded", "model": model_path})
+
+    def enable_prompt_cache(self, client: Llama):
+        # Opt-in via SUM_PROMPT_CACHE_MB: every completion snapshots the full KV state plus the logits
+        # buffer (hundreds of MB for 128k-vocab models), and only the KV state counts against the capacity,
+        # so real memory use is well above the configured size.
+        capacity = prompt_cache_bytes_from_env(0)
+        if LlamaRAMCache is None or capacity <= 0 or not hasattr(client, "set_cache"):
+            return
+        try:
+            client.set_cache(LlamaRAMCache(capacity_bytes=capacity))
+        except Exception as e:
+            self.send({"event": "progress", "msg": f"prompt cache disabled: {e}"})
 
     def summarize(self, text: str, out_path: Optional[str], chunk_words: int, context: Optional[dict] = None):
         with self.lock:
@@ -244,7 +266,7 @@ class SummarizerDaemon:
                 self.send({"event": "error", "msg": "model not loaded", "out": out_path})
                 return
             self.send({"event": "summary_start", "out": out_path, "context": context})
-            word_count = count_words(text)
+            word_count = count_words(text, limit=self.min_words)
             if word_count < self.min_words:
                 msg = f"transcript too short ({word_count} words); skipping summary"
                 self.send({"event": "progress", "msg": msg, "context": context})
@@ -274,7 +296,7 @@ class SummarizerDaemon:
             if sentence_count < MIN_SUMMARY_SENTENCES:
                 self.send({"event": "progress", "msg": "regenerating summary to reach 5-7 sentences", "context": context})
                 try:
-                    expanded = summarize_with_llm(self.client, text, EXPANDED_SUMMARY_PROMPT, max_tokens=512)
+                    expanded = summarize_with_llm(self.client, text, EXPANDED_SUMMARY_PROMPT, max_tokens=SUMMARY_MAX_TOKENS)
                     if expanded:
                         summary = expanded
                 except Exception as e:
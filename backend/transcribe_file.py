@@ -34,9 +34,36 @@ def send(obj: dict):
 
 
 def load_model(model_name: str):
+    """Return transcribe(audio_path) -> str.
+
+    openai-whisper by default; WHISPER_BACKEND=faster opts into faster-whisper (CTranslate2,
+    int8 on CPU / float16 on CUDA) and falls back to openai-whisper if it cannot be loaded.
+    """
     device = "cuda" if torch and torch.cuda.is_available() else "cpu"
     download_root = os.environ.get("WHISPER_ROOT")
-    return whisper.load_model(model_name, device=device, download_root=download_root)
+    backend = os.environ.get("WHISPER_BACKEND", "").strip().lower()
+    if backend in ("faster", "faster-whisper", "ctranslate2"):
+        try:
+            from faster_whisper import WhisperModel
+
+            compute_type = "float16" if device == "cuda" else "int8"
+            fw_model = WhisperModel(model_name, device=device, compute_type=compute_type, download_root=download_root)
+
+            def transcribe_faster(audio_path: str) -> str:
+                segments, _info = fw_model.transcribe(audio_path, language="en", task="transcribe", beam_size=1)
+                return "".join(seg.text for seg in segments).strip()
+
+            return transcribe_faster
+        except Exception as e:
+            print(f"[transcribe] faster-whisper unavailable, using openai-whisper: {e}", file=sys.stderr, flush=True)
+
+    model = whisper.load_model(model_name, device=device, download_root=download_root)
+
+    def transcribe_openai(audio_path: str) -> str:
+        result = model.transcribe(audio_path, language="en", task="transcribe", fp16=device == "cuda")
+        return result.get("text", "").strip()
+
+    return transcribe_openai
 
 
 def main():
@@ -55,15 +82,14 @@ def main():
 
     send({"event": "ready"})
     try:
-        model = load_model(args.model)
+        transcribe = load_model(args.model)
     except Exception as e:
         send({"event": "error", "msg": f"failed to load model {args.model}: {e}"})
         sys.exit(3)
 
     send({"event": "started", "out": audio_path, "transcript_out": transcript_out})
     try:
-        result = model.transcribe(audio_path, language="en", task="transcribe", fp16=False)
-        text = result.get("text", "").strip()
+        text = transcribe(audio_path)
         with open(transcript_out, "w", encoding="utf-8") as f:
             f.write(text)
         send({"event": "done", "out": transcript_out, "text": text})